@@ -1,26 +1,84 @@
-import joblib
+import asyncio
+import os
+import time
 import pandas as pd
 from fastapi import FastAPI, UploadFile, File, Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, EmailStr
 from datetime import datetime, timedelta
 import jwt
+import jwt.algorithms
+from cachetools import TLRUCache
+import orjson
 import uuid
 from typing import List
+from contextlib import asynccontextmanager
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # fall back to the pandas CSV parser
+    pa = None
 
 import database as db
+import inference
 
 # JWT settings
 SECRET_KEY = "your-secret-key-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440  # 24 hours
 
-# Load ML pipeline
-pipeline = joblib.load("../best_pipeline.pkl")
-meta = joblib.load("../pipeline_meta.pkl")
+# PyJWT only uses OpenSSL-backed crypto when the cryptography package is installed
+if not jwt.algorithms.has_crypto:
+    print("⚠️  PyJWT cryptography backend not found, install it with: pip install 'PyJWT[crypto]'")
+
+# Authenticated users by raw token, so repeat requests skip JWT decoding and the user lookup.
+# Entries hold (user, exp) and expire after TOKEN_CACHE_TTL seconds or at the token's own
+# exp, whichever comes first. A user removed from the database keeps access for at most
+# TOKEN_CACHE_TTL seconds (set it to 0 to look the user up on every request).
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", "60"))
+
+def token_cache_ttu(token, entry, now):
+    return min(now + TOKEN_CACHE_TTL, entry[1])
+
+TOKEN_CACHE = TLRUCache(maxsize=10000, ttu=token_cache_ttu, timer=time.time)
+
+# Rows parsed, scored and inserted at a time by /predict_batch
+BATCH_CHUNK_SIZE = 50_000
+# Bytes per block for the PyArrow CSV reader (roughly BATCH_CHUNK_SIZE rows)
+BATCH_BLOCK_SIZE = 8 << 20
+
+# CSV parser for batch uploads: "pyarrow" (default when installed) or "pandas"
+CSV_ENGINE = os.getenv("CSV_ENGINE", "pyarrow" if pa is not None else "pandas")
+
+# ML pipeline metadata (the pipeline itself is loaded lazily per worker)
+meta = inference.meta
+
+# Under gunicorn's preload_app (see gunicorn.conf.py), load the sklearn pipeline before workers fork
+if os.getenv("PRELOAD_MODEL") == "1":
+    inference.warm_up()
+
+class ORJSONResponse(JSONResponse):
+    """JSON response serialized with orjson"""
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
 
-app = FastAPI(title="Loan Payback Prediction API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await db.startup()
+    inference.batcher.start()
+    yield
+    await inference.batcher.stop()
+    await db.shutdown()
+
+app = FastAPI(
+    title="Loan Payback Prediction API",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
+)
 
 # CORS middleware
 app.add_middleware(
@@ -32,6 +90,9 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+# Compress large responses such as the prediction history
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 security = HTTPBearer()
 
 # Pydantic models
@@ -62,6 +123,9 @@ class LoanData(BaseModel):
     loan_purpose: str
     grade_subgrade: str
 
+# CSV columns a batch upload must provide, in LoanData (and insert-row) order
+BATCH_FEATURE_COLUMNS = [field for field in LoanData.model_fields if field != "name"]
+
 class PredictionResponse(BaseModel):
     id: int
     prediction: int
@@ -84,38 +148,44 @@ def decode_token(token: str):
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
+    entry = TOKEN_CACHE.get(token)
+    if entry is not None:
+        return entry[0]
+    
     payload = decode_token(token)
     username = payload.get("sub")
     if username is None:
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    user = db.get_user_by_username(username)
+    user = await db.get_user_identity(username)
     if user is None:
         raise HTTPException(status_code=401, detail="User not found")
+    
+    TOKEN_CACHE[token] = (user, payload.get("exp", 0))
     return user
 
 # Auth endpoints
 @app.post("/register", response_model=Token)
-def register(user_data: UserRegister):
+async def register(user_data: UserRegister):
     # Check if user exists
-    if db.get_user_by_username(user_data.username):
+    if await db.get_user_by_username(user_data.username):
         raise HTTPException(status_code=400, detail="Username already exists")
-    if db.get_user_by_email(user_data.email):
+    if await db.get_user_by_email(user_data.email):
         raise HTTPException(status_code=400, detail="Email already exists")
     
     # Create user
-    user = db.create_user(user_data.username, user_data.email, user_data.password)
+    user = await db.create_user(user_data.username, user_data.email, user_data.password)
     
     # Create token
     access_token = create_access_token(data={"sub": user["username"]})
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/login", response_model=Token)
-def login(user_data: UserLogin):
-    user = db.get_user_by_username(user_data.username)
-    if not user or not db.verify_password(user_data.password, user["hashed_password"]):
+async def login(user_data: UserLogin):
+    user = await db.get_user_by_username(user_data.username)
+    if not user or not await db.verify_password(user_data.password, user["hashed_password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     access_token = create_access_token(data={"sub": user["username"]})
@@ -123,24 +193,25 @@ def login(user_data: UserLogin):
 
 # Prediction endpoints
 @app.post("/predict_single", response_model=PredictionResponse)
-def predict_single(data: LoanData, current_user: dict = Depends(get_current_user)):
+async def predict_single(data: LoanData, current_user: dict = Depends(get_current_user)):
     # Make prediction (exclude name from model input)
     loan_data_dict = data.dict()
     name = loan_data_dict.pop("name")
     
-    df = pd.DataFrame([loan_data_dict], columns=meta["all_feature_columns"])
-    pred = pipeline.predict(df)[0]
-    prob = pipeline.predict_proba(df)[0, 1]
+    # Repeated submissions of the same form are answered from the prediction cache
+    pred, prob = await inference.predict(
+        tuple(loan_data_dict[col] for col in inference.FEATURE_ORDER)
+    )
     
     # Add name back for storage
     loan_data_dict["name"] = name
     
     # Save to database
-    prediction = db.create_prediction(
+    prediction = await db.create_prediction(
         user_id=current_user["id"],
         loan_data=loan_data_dict,
-        prediction=int(pred),
-        probability=float(prob),
+        prediction=pred,
+        probability=prob,
         prediction_type="single"
     )
     
@@ -151,62 +222,138 @@ def predict_single(data: LoanData, current_user: dict = Depends(get_current_user
         "created_at": prediction["created_at"]
     }
 
-@app.post("/predict_batch")
-async def predict_batch(file: UploadFile = File(...), current_user: dict = Depends(get_current_user)):
-    df = pd.read_csv(file.file)
+def iter_csv_chunks(file):
+    """Yield the uploaded CSV as a sequence of DataFrames"""
+    if CSV_ENGINE != "pyarrow":
+        # A header-only CSV comes back as one empty chunk; skip it like the pyarrow path does
+        for chunk in pd.read_csv(file, chunksize=BATCH_CHUNK_SIZE):
+            if len(chunk):
+                yield chunk
+        return
+    
+    # Pin column types so a later block can't disagree with the first one's inference
+    column_types = {"name": pa.string()}
+    column_types.update({col: pa.float64() for col in meta["numeric_cols"]})
+    column_types.update({col: pa.string() for col in meta["categorical_cols"]})
     
-    # Extract names before prediction
-    names = df["name"].tolist() if "name" in df.columns else ["Unknown"] * len(df)
+    reader = pa_csv.open_csv(
+        file,
+        read_options=pa_csv.ReadOptions(block_size=BATCH_BLOCK_SIZE),
+        # Read blank text cells as missing, as pandas does
+        convert_options=pa_csv.ConvertOptions(column_types=column_types, strings_can_be_null=True)
+    )
+    for batch in reader:
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+def predict_next_chunk(reader) -> list:
+    """Read the next CSV chunk and score it, returning rows ready for insert (None when done)"""
+    try:
+        df = next(reader, None)
+    except ValueError as e:
+        # Covers bad numerics under both engines (pyarrow.ArrowInvalid subclasses ValueError)
+        raise HTTPException(status_code=400, detail=f"Could not parse CSV: {e}")
+    if df is None:
+        return None
     
-    # Remove name column for prediction
-    df_for_prediction = df.drop(columns=["name"], errors="ignore")
+    # Everything LoanData needs except name, which falls back to "Unknown"
+    missing = [col for col in BATCH_FEATURE_COLUMNS if col not in df.columns]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"CSV is missing columns: {', '.join(missing)}")
     
-    preds = pipeline.predict(df_for_prediction)
-    probs = pipeline.predict_proba(df_for_prediction)[:, 1]
+    # Blank feature cells would reach the model as NaN/"nan" (and NaN can't be inserted into MySQL)
+    incomplete = [col for col in BATCH_FEATURE_COLUMNS if df[col].isna().any()]
+    if incomplete:
+        raise HTTPException(status_code=400, detail=f"CSV has missing values in columns: {', '.join(incomplete)}")
+    
+    # Names are optional, whether the column or a single cell is missing
+    names = df["name"].fillna("Unknown").tolist() if "name" in df.columns else ["Unknown"] * len(df)
+    
+    # Convert each feature column once and reuse the arrays for both scoring and the insert rows
+    try:
+        columns = inference.frame_columns(df)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid numeric value in CSV: {e}")
+    
+    preds, probs = inference.predict_columns(columns)
+    features = [columns[col].tolist() for col in BATCH_FEATURE_COLUMNS]
+    return list(zip(names, *features, preds.tolist(), probs.tolist()))
+
+@app.post("/predict_batch")
+async def predict_batch(file: UploadFile = File(...), current_user: dict = Depends(get_current_user)):
+    # Parse the upload in chunks so memory stays bounded by one chunk
+    reader = iter_csv_chunks(file.file)
+    user_id = current_user["id"]
     
     # Generate batch ID
     batch_id = str(uuid.uuid4())
     
-    # Save all predictions
-    predictions = []
-    for idx, row in df_for_prediction.iterrows():
-        loan_data = {
-            "name": names[idx],
-            "annual_income": float(row["annual_income"]),
-            "debt_to_income_ratio": float(row["debt_to_income_ratio"]),
-            "credit_score": float(row["credit_score"]),
-            "loan_amount": float(row["loan_amount"]),
-            "interest_rate": float(row["interest_rate"]),
-            "gender": str(row["gender"]),
-            "marital_status": str(row["marital_status"]),
-            "education_level": str(row["education_level"]),
-            "employment_status": str(row["employment_status"]),
-            "loan_purpose": str(row["loan_purpose"]),
-            "grade_subgrade": str(row["grade_subgrade"])
-        }
+    # Score the first chunk before streaming so a bad upload still gets an error status
+    try:
+        first_rows = await asyncio.to_thread(predict_next_chunk, reader)
+    except BaseException:
+        # Close the half-read parser now, while the upload file is still open
+        reader.close()
+        raise
+    
+    async def stream_predictions():
+        # Same document as before ({"batch_id", "predictions", "count"}), written chunk by chunk
+        yield b'{"batch_id":' + orjson.dumps(batch_id) + b',"predictions":['
         
-        prediction = db.create_prediction(
-            user_id=current_user["id"],
-            loan_data=loan_data,
-            prediction=int(preds[idx]),
-            probability=float(probs[idx]),
-            prediction_type="batch",
-            batch_id=batch_id
-        )
+        count = 0
+        rows = first_rows
+        try:
+            while rows:
+                # Commit each chunk before streaming it, so no pooled connection
+                # stays checked out while the client reads the response
+                await db.create_predictions_bulk(
+                    user_id=user_id,
+                    rows=rows,
+                    batch_id=batch_id,
+                    prediction_type="batch"
+                )
+                
+                predictions = orjson.dumps([
+                    {"name": row[0], "prediction": row[-2], "probability": row[-1]}
+                    for row in rows
+                ])
+                yield (b"," if count else b"") + predictions[1:-1]
+                
+                count += len(rows)
+                rows = await asyncio.to_thread(predict_next_chunk, reader)
+        except BaseException:
+            # A later chunk failed (or the client went away) after headers were sent:
+            # the body is truncated, so drop the chunks already stored for this batch
+            await db.delete_batch_predictions(batch_id)
+            raise
+        finally:
+            reader.close()
         
-        predictions.append({
-            "name": names[idx],
-            "prediction": int(preds[idx]),
-            "probability": float(probs[idx])
-        })
+        # Only report the count once every chunk is stored
+        yield b'],"count":' + str(count).encode() + b'}'
     
-    return {"batch_id": batch_id, "count": len(predictions), "predictions": predictions}
+    return StreamingResponse(stream_predictions(), media_type="application/json")
 
 @app.get("/predictions/history")
-def get_history(current_user: dict = Depends(get_current_user)):
-    predictions = db.get_user_predictions(current_user["id"])
-    return predictions
+async def get_history(current_user: dict = Depends(get_current_user)):
+    predictions = await db.get_user_predictions(current_user["id"])
+    return ORJSONResponse(predictions)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("app:app", host="127.0.0.1", port=8080, reload=True)
\ No newline at end of file
+    
+    # Set UVICORN_RELOAD=1 for local development (reload only supports one worker)
+    reload = os.getenv("UVICORN_RELOAD") == "1"
+    workers = 1 if reload else int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+    
+    uvicorn.run(
+        "app:app",
+        host="127.0.0.1",
+        port=8080,
+        workers=workers,
+        # uvloop/httptools when installed (uvicorn[standard] skips uvloop on Windows)
+        loop="auto",
+        http="auto",
+        limit_concurrency=1000,
+        reload=reload
+    )
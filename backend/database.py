@@ -1,9 +1,18 @@
-import mysql.connector
-from mysql.connector import Error, pooling
+import asyncio
+import hashlib
+import hmac
+import multiprocessing
+import os
+import secrets
+import asyncmy
+from asyncmy.cursors import DictCursor
+from asyncmy.errors import Error
 import bcrypt
 from datetime import datetime
 import json
-from contextlib import contextmanager
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
 
 # MySQL Configuration for XAMPP
 DB_CONFIG = {
@@ -14,125 +23,234 @@ DB_CONFIG = {
     'port': 3307
 }
 
+# Web worker processes (same default as app.py and gunicorn.conf.py). Each one
+# opens its own connection pool and bcrypt process pool.
+WEB_WORKERS = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+
+# Connection pool sizing, per worker. The total across workers stays within
+# DB_MAX_CONNECTIONS, below MySQL/MariaDB's default max_connections of 151.
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "100"))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", str(max(1, DB_MAX_CONNECTIONS // WEB_WORKERS))))
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", str(min(5, POOL_MAX_SIZE))))
+
+# On servers with the thread pool plugin (MariaDB, Percona, MySQL Enterprise),
+# cap server-side thread churn in my.cnf; XAMPP works without it:
+#   [mysqld]
+#   thread_handling = pool-of-threads
+#   thread_pool_size = <nproc>
+#   thread_pool_max_threads = <nproc * 32>
+
 # Create connection pool
 connection_pool = None
 
-def init_connection_pool():
+async def init_connection_pool():
     """Initialize MySQL connection pool"""
     global connection_pool
     try:
-        connection_pool = pooling.MySQLConnectionPool(
-            pool_name="loan_pool",
-            pool_size=5,
-            pool_reset_session=True,
+        connection_pool = await asyncmy.create_pool(
+            minsize=POOL_MIN_SIZE,
+            maxsize=POOL_MAX_SIZE,
             **DB_CONFIG
         )
         print(" MySQL connection pool created successfully!")
     except Error as e:
         print(f" Error creating connection pool: {e}")
 
-@contextmanager
-def get_db():
-    """Context manager for database connections"""
+async def close_connection_pool():
+    """Close MySQL connection pool"""
+    global connection_pool
+    if connection_pool is not None:
+        connection_pool.close()
+        await connection_pool.wait_closed()
+        connection_pool = None
+
+@asynccontextmanager
+async def get_db():
+    """Async context manager for database connections"""
     if connection_pool is None:
-        init_connection_pool()
+        await init_connection_pool()
     
-    conn = connection_pool.get_connection()
-    cursor = conn.cursor(dictionary=True)
-    try:
-        yield cursor
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        raise e
-    finally:
-        cursor.close()
-        conn.close()
+    async with connection_pool.acquire() as conn:
+        async with conn.cursor(DictCursor) as cursor:
+            try:
+                yield cursor
+                await conn.commit()
+            except BaseException:
+                # Also roll back when the caller is cancelled or abandons a stream
+                await conn.rollback()
+                raise
 
-def create_database():
+async def create_database():
     """Create database if it doesn't exist"""
     try:
-        conn = mysql.connector.connect(
+        conn = await asyncmy.connect(
             host=DB_CONFIG['host'],
             user=DB_CONFIG['user'],
             password=DB_CONFIG['password'],
             port=DB_CONFIG['port']
         )
-        cursor = conn.cursor()
-        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DB_CONFIG['database']}")
-        cursor.close()
-        conn.close()
+        async with conn.cursor() as cursor:
+            await cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DB_CONFIG['database']}")
+        await conn.ensure_closed()
         print(f" Database '{DB_CONFIG['database']}' is ready!")
     except Error as e:
         print(f" Error creating database: {e}")
         raise e
 
-def init_db():
+# Named MySQL lock held while creating and migrating tables
+SCHEMA_LOCK = "loan_schema"
+SCHEMA_LOCK_TIMEOUT = 60
+
+async def init_db():
     """Initialize database tables"""
     # First, ensure database exists
-    create_database()
+    await create_database()
     
     # Now create tables
-    with get_db() as cursor:
-        # Users table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                username VARCHAR(255) UNIQUE NOT NULL,
-                email VARCHAR(255) UNIQUE NOT NULL,
-                hashed_password VARCHAR(255) NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                INDEX idx_username (username),
-                INDEX idx_email (email)
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-        ''')
-        
-        # Predictions table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS predictions (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                name VARCHAR(255),
-                annual_income DECIMAL(15, 2),
-                debt_to_income_ratio DECIMAL(5, 4),
-                credit_score DECIMAL(5, 2),
-                loan_amount DECIMAL(15, 2),
-                interest_rate DECIMAL(5, 2),
-                gender VARCHAR(50),
-                marital_status VARCHAR(50),
-                education_level VARCHAR(100),
-                employment_status VARCHAR(100),
-                loan_purpose VARCHAR(100),
-                grade_subgrade VARCHAR(10),
-                prediction TINYINT NOT NULL,
-                probability DECIMAL(5, 4) NOT NULL,
-                prediction_type VARCHAR(20) NOT NULL,
-                batch_id VARCHAR(255),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                INDEX idx_user_id (user_id),
-                INDEX idx_batch_id (batch_id),
-                INDEX idx_created_at (created_at)
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-        ''')
+    async with get_db() as cursor:
+        # Every web worker runs this at startup, so serialize the checks and ALTERs
+        # on a named lock; later workers then see the schema already migrated
+        await cursor.execute('SELECT GET_LOCK(%s, %s) AS locked', (SCHEMA_LOCK, SCHEMA_LOCK_TIMEOUT))
+        if (await cursor.fetchone())['locked'] != 1:
+            raise RuntimeError(f"Timed out waiting for the {SCHEMA_LOCK} schema lock")
+        try:
+            # Users table
+            await cursor.execute('''
+                CREATE TABLE IF NOT EXISTS users (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    username VARCHAR(255) UNIQUE NOT NULL,
+                    email VARCHAR(255) UNIQUE NOT NULL,
+                    hashed_password VARCHAR(255) NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    INDEX idx_username (username),
+                    INDEX idx_email (email)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            ''')
+            
+            # Predictions table
+            await cursor.execute('''
+                CREATE TABLE IF NOT EXISTS predictions (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    user_id INT NOT NULL,
+                    name VARCHAR(255),
+                    annual_income DECIMAL(15, 2),
+                    debt_to_income_ratio DECIMAL(5, 4),
+                    credit_score DECIMAL(5, 2),
+                    loan_amount DECIMAL(15, 2),
+                    interest_rate DECIMAL(5, 2),
+                    gender VARCHAR(50),
+                    marital_status VARCHAR(50),
+                    education_level VARCHAR(100),
+                    employment_status VARCHAR(100),
+                    loan_purpose VARCHAR(100),
+                    grade_subgrade VARCHAR(10),
+                    prediction TINYINT NOT NULL,
+                    probability DECIMAL(5, 4) NOT NULL,
+                    prediction_type VARCHAR(20) NOT NULL,
+                    batch_id VARCHAR(255),
+                    created_at DATETIME(6) DEFAULT CURRENT_TIMESTAMP(6),
+                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+                    INDEX idx_user_created (user_id, created_at DESC),
+                    INDEX idx_batch_id (batch_id)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            ''')
+            
+            # Migrate tables created before the composite history index existed
+            await cursor.execute('''
+                SELECT COUNT(*) AS count FROM information_schema.statistics
+                WHERE table_schema = %s AND table_name = 'predictions'
+                  AND index_name = 'idx_user_created'
+            ''', (DB_CONFIG['database'],))
+            if (await cursor.fetchone())['count'] == 0:
+                await cursor.execute('''
+                    ALTER TABLE predictions
+                        ADD INDEX idx_user_created (user_id, created_at DESC),
+                        DROP INDEX idx_user_id,
+                        DROP INDEX idx_created_at
+                ''')
+                print("✅ Added idx_user_created index to predictions table")
+            
+            # Migrate second-precision created_at columns to DATETIME(6)
+            await cursor.execute('''
+                SELECT DATA_TYPE AS data_type, DATETIME_PRECISION AS precision_digits
+                FROM information_schema.columns
+                WHERE table_schema = %s AND table_name = 'predictions'
+                  AND column_name = 'created_at'
+            ''', (DB_CONFIG['database'],))
+            column = await cursor.fetchone()
+            if column['data_type'].lower() != 'datetime' or column['precision_digits'] != 6:
+                await cursor.execute('''
+                    ALTER TABLE predictions
+                        MODIFY created_at DATETIME(6) DEFAULT CURRENT_TIMESTAMP(6)
+                ''')
+                print("✅ Changed predictions.created_at to DATETIME(6)")
+        finally:
+            await cursor.execute('SELECT RELEASE_LOCK(%s)', (SCHEMA_LOCK,))
+            await cursor.fetchone()
         
         print("✅ Database tables initialized successfully!")
 
+# Password hashing
+# bcrypt is CPU-bound (~250 ms per call), so it runs in a process pool
+BCRYPT_ROUNDS = 12
+hash_pool = None
+
+# Split the cores between web workers instead of giving each worker all of them
+HASH_POOL_SIZE = int(os.getenv("HASH_POOL_SIZE", str(max(1, (os.cpu_count() or 1) // WEB_WORKERS))))
+
+# Recently verified logins, keyed by (stored hash, keyed digest of the password).
+# Changing a password stores a new hash, which invalidates the old entries.
+VERIFIED_CACHE_SIZE = 1024
+_verified_cache = OrderedDict()
+_verified_cache_key = secrets.token_bytes(32)
+
+def get_hash_pool() -> ProcessPoolExecutor:
+    """Get the process pool used for bcrypt work"""
+    global hash_pool
+    if hash_pool is None:
+        # The web worker already runs threads, so don't fork it directly: forkserver
+        # children come from a clean single-threaded server (spawn on Windows)
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        hash_pool = ProcessPoolExecutor(
+            max_workers=HASH_POOL_SIZE,
+            mp_context=multiprocessing.get_context(method)
+        )
+    return hash_pool
+
 # User functions
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt"""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(BCRYPT_ROUNDS)).decode('utf-8')
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    digest = hmac.new(_verified_cache_key, plain_password.encode('utf-8'), hashlib.sha256).digest()
+    cache_key = (hashed_password, digest)
+    if cache_key in _verified_cache:
+        _verified_cache.move_to_end(cache_key)
+        return True
+    
+    loop = asyncio.get_running_loop()
+    verified = await loop.run_in_executor(
+        get_hash_pool(),
+        bcrypt.checkpw,
+        plain_password.encode('utf-8'),
+        hashed_password.encode('utf-8')
+    )
+    
+    if verified:
+        _verified_cache[cache_key] = True
+        if len(_verified_cache) > VERIFIED_CACHE_SIZE:
+            _verified_cache.popitem(last=False)
+    return verified
 
-def create_user(username: str, email: str, password: str) -> dict:
+async def create_user(username: str, email: str, password: str) -> dict:
     """Create a new user"""
-    hashed_pw = hash_password(password)
+    loop = asyncio.get_running_loop()
+    hashed_pw = await loop.run_in_executor(get_hash_pool(), hash_password, password)
     
-    with get_db() as cursor:
-        cursor.execute(
+    async with get_db() as cursor:
+        await cursor.execute(
             'INSERT INTO users (username, email, hashed_password) VALUES (%s, %s, %s)',
             (username, email, hashed_pw)
         )
@@ -145,128 +263,180 @@ def create_user(username: str, email: str, password: str) -> dict:
             "hashed_password": hashed_pw
         }
 
-def get_user_by_username(username: str) -> dict:
+async def get_user_by_username(username: str) -> dict:
     """Get user by username"""
-    with get_db() as cursor:
-        cursor.execute('SELECT * FROM users WHERE username = %s', (username,))
-        row = cursor.fetchone()
+    async with get_db() as cursor:
+        await cursor.execute('SELECT * FROM users WHERE username = %s', (username,))
+        row = await cursor.fetchone()
         return row
 
-def get_user_by_email(email: str) -> dict:
+async def get_user_identity(username: str) -> dict:
+    """Get only the id and username of a user (for authenticating requests)"""
+    async with get_db() as cursor:
+        await cursor.execute('SELECT id, username FROM users WHERE username = %s', (username,))
+        return await cursor.fetchone()
+
+async def get_user_by_email(email: str) -> dict:
     """Get user by email"""
-    with get_db() as cursor:
-        cursor.execute('SELECT * FROM users WHERE email = %s', (email,))
-        row = cursor.fetchone()
+    async with get_db() as cursor:
+        await cursor.execute('SELECT * FROM users WHERE email = %s', (email,))
+        row = await cursor.fetchone()
         return row
 
 # Prediction functions
-def create_prediction(user_id: int, loan_data: dict, prediction: int, 
-                     probability: float, prediction_type: str, batch_id: str = None) -> dict:
+# Columns returned to clients. Decimals and timestamps are converted in SQL so
+# the driver hands back JSON-ready floats and strings (% is doubled because
+# these queries are always run with parameters). The formatted created_at
+# shadows the column, so ORDER BY names predictions.created_at to keep using
+# the idx_user_created index.
+PREDICTION_COLUMNS = '''
+    id, user_id, name,
+    CAST(annual_income AS DOUBLE) AS annual_income,
+    CAST(debt_to_income_ratio AS DOUBLE) AS debt_to_income_ratio,
+    CAST(credit_score AS DOUBLE) AS credit_score,
+    CAST(loan_amount AS DOUBLE) AS loan_amount,
+    CAST(interest_rate AS DOUBLE) AS interest_rate,
+    gender, marital_status, education_level, employment_status,
+    loan_purpose, grade_subgrade, prediction,
+    CAST(probability AS DOUBLE) AS probability,
+    prediction_type, batch_id,
+    DATE_FORMAT(created_at, '%%Y-%%m-%%dT%%H:%%i:%%s.%%f') AS created_at
+'''
+
+# Loan fields stored with each prediction, in table column order
+LOAN_FIELDS = (
+    "name", "annual_income", "debt_to_income_ratio", "credit_score",
+    "loan_amount", "interest_rate", "gender", "marital_status",
+    "education_level", "employment_status", "loan_purpose", "grade_subgrade"
+)
+
+# build_row is generated once for the fixed schema so each insert tuple is a
+# single expression of inlined subscripts instead of a dozen dict.get calls
+_build_row_source = (
+    "def build_row(user_id, loan_data, prediction, probability, prediction_type, batch_id, created_at):\n"
+    "    return (user_id, "
+    + "".join(f"loan_data[{field!r}], " for field in LOAN_FIELDS)
+    + "prediction, probability, prediction_type, batch_id, created_at)\n"
+)
+exec(_build_row_source, globals())
+
+async def create_prediction(user_id: int, loan_data: dict, prediction: int, 
+                           probability: float, prediction_type: str, batch_id: str = None) -> dict:
     """Create a new prediction record"""
-    with get_db() as cursor:
-        cursor.execute('''
+    # Timestamp the row here so the returned record matches what is stored
+    created_at = datetime.now()
+    
+    async with get_db() as cursor:
+        await cursor.execute('''
             INSERT INTO predictions (
                 user_id, name, annual_income, debt_to_income_ratio, 
                 credit_score, loan_amount, interest_rate, gender, 
                 marital_status, education_level, employment_status, 
                 loan_purpose, grade_subgrade, prediction, probability, 
-                prediction_type, batch_id
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        ''', (
-            user_id,
-            loan_data.get("name"),
-            loan_data.get("annual_income"),
-            loan_data.get("debt_to_income_ratio"),
-            loan_data.get("credit_score"),
-            loan_data.get("loan_amount"),
-            loan_data.get("interest_rate"),
-            loan_data.get("gender"),
-            loan_data.get("marital_status"),
-            loan_data.get("education_level"),
-            loan_data.get("employment_status"),
-            loan_data.get("loan_purpose"),
-            loan_data.get("grade_subgrade"),
-            prediction,
-            probability,
-            prediction_type,
-            batch_id
-        ))
-        
-        prediction_id = cursor.lastrowid
-        
-        # Get the created prediction
-        cursor.execute('SELECT * FROM predictions WHERE id = %s', (prediction_id,))
-        row = cursor.fetchone()
+                prediction_type, batch_id, created_at
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ''', build_row(user_id, loan_data, prediction, probability,
+                     prediction_type, batch_id, created_at))
         
-        # Convert datetime to string for JSON serialization
-        if row and 'created_at' in row:
-            row['created_at'] = row['created_at'].isoformat()
-        
-        return row
+        # Every column is already known, so build the record instead of re-selecting it
+        return {
+            "id": cursor.lastrowid,
+            "user_id": user_id,
+            **loan_data,
+            "prediction": prediction,
+            "probability": probability,
+            "prediction_type": prediction_type,
+            "batch_id": batch_id,
+            "created_at": created_at.isoformat(timespec="microseconds")
+        }
+
+async def create_predictions_bulk(user_id: int, rows: list, batch_id: str,
+                                  prediction_type: str) -> int:
+    """Create many prediction records in one round-trip.
+
+    Each row is a tuple of (name, annual_income, debt_to_income_ratio,
+    credit_score, loan_amount, interest_rate, gender, marital_status,
+    education_level, employment_status, loan_purpose, grade_subgrade,
+    prediction, probability). Returns the number of inserted rows.
+    """
+    if not rows:
+        return 0
+
+    # Same app-side clock as create_prediction, so history ordering never mixes clocks
+    created_at = datetime.now()
+
+    async with get_db() as cursor:
+        await cursor.executemany('''
+            INSERT INTO predictions (
+                user_id, name, annual_income, debt_to_income_ratio, 
+                credit_score, loan_amount, interest_rate, gender, 
+                marital_status, education_level, employment_status, 
+                loan_purpose, grade_subgrade, prediction, probability, 
+                prediction_type, batch_id, created_at
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ''', [(user_id, *row, prediction_type, batch_id, created_at) for row in rows])
+
+        return cursor.rowcount
 
-def get_user_predictions(user_id: int) -> list:
+async def delete_batch_predictions(batch_id: str) -> int:
+    """Delete every prediction stored under a batch ID"""
+    async with get_db() as cursor:
+        await cursor.execute('DELETE FROM predictions WHERE batch_id = %s', (batch_id,))
+        return cursor.rowcount
+
+async def get_user_predictions(user_id: int) -> list:
     """Get all predictions for a user"""
-    with get_db() as cursor:
-        cursor.execute(
-            'SELECT * FROM predictions WHERE user_id = %s ORDER BY created_at DESC',
+    async with get_db() as cursor:
+        await cursor.execute(
+            f'SELECT {PREDICTION_COLUMNS} FROM predictions WHERE user_id = %s ORDER BY predictions.created_at DESC',
             (user_id,)
         )
-        rows = cursor.fetchall()
-        
-        # Convert datetime objects to strings
-        for row in rows:
-            if 'created_at' in row and row['created_at']:
-                row['created_at'] = row['created_at'].isoformat()
-            # Convert Decimal to float for JSON serialization
-            for key in ['annual_income', 'debt_to_income_ratio', 'credit_score', 
-                       'loan_amount', 'interest_rate', 'probability']:
-                if key in row and row[key] is not None:
-                    row[key] = float(row[key])
-        
-        return rows
+        return await cursor.fetchall()
 
-def get_prediction_by_id(prediction_id: int) -> dict:
+async def get_prediction_by_id(prediction_id: int) -> dict:
     """Get a single prediction by ID"""
-    with get_db() as cursor:
-        cursor.execute('SELECT * FROM predictions WHERE id = %s', (prediction_id,))
-        row = cursor.fetchone()
-        
-        if row and 'created_at' in row:
-            row['created_at'] = row['created_at'].isoformat()
-        
-        return row
+    async with get_db() as cursor:
+        await cursor.execute(
+            f'SELECT {PREDICTION_COLUMNS} FROM predictions WHERE id = %s',
+            (prediction_id,)
+        )
+        return await cursor.fetchone()
 
-def get_batch_predictions(batch_id: str) -> list:
+async def get_batch_predictions(batch_id: str) -> list:
     """Get all predictions from a batch"""
-    with get_db() as cursor:
-        cursor.execute(
-            'SELECT * FROM predictions WHERE batch_id = %s ORDER BY created_at',
+    async with get_db() as cursor:
+        await cursor.execute(
+            f'SELECT {PREDICTION_COLUMNS} FROM predictions WHERE batch_id = %s ORDER BY predictions.created_at',
             (batch_id,)
         )
-        rows = cursor.fetchall()
-        
-        for row in rows:
-            if 'created_at' in row and row['created_at']:
-                row['created_at'] = row['created_at'].isoformat()
-        
-        return rows
+        return await cursor.fetchall()
 
-# Initialize database when module is imported
-if __name__ != "__main__":
+# Application lifecycle hooks
+async def startup():
+    """Initialize the database when the application starts"""
     try:
-        init_db()
+        await init_db()
     except Exception as e:
         print(f"⚠️  Database initialization warning: {e}")
         print("⚠️  Make sure XAMPP MySQL is running!")
-else:
-    # If run directly, test the database connection
+
+async def shutdown():
+    """Release database connections and worker processes when the application stops"""
+    global hash_pool
+    await close_connection_pool()
+    if hash_pool is not None:
+        hash_pool.shutdown()
+        hash_pool = None
+
+async def test_connection():
+    """Test the database connection and print table statistics"""
     print("=" * 60)
     print(" Testing Loan Prediction Database Connection")
     print("=" * 60)
     
     try:
         # Test database creation and connection
-        init_db()
+        await init_db()
         
         print("\n SUCCESS! Database is working properly!")
         print("\n Database Information:")
@@ -275,14 +445,14 @@ else:
         print(f"   Port: {DB_CONFIG['port']}")
         
         # Check tables
-        with get_db() as cursor:
-            cursor.execute("SHOW TABLES")
-            tables = cursor.fetchall()
+        async with get_db() as cursor:
+            await cursor.execute("SHOW TABLES")
+            tables = await cursor.fetchall()
             print(f"\n Tables found: {len(tables)}")
             for table in tables:
                 table_name = list(table.values())[0]
-                cursor.execute(f"SELECT COUNT(*) as count FROM {table_name}")
-                count = cursor.fetchone()['count']
+                await cursor.execute(f"SELECT COUNT(*) as count FROM {table_name}")
+                count = (await cursor.fetchone())['count']
                 print(f"   - {table_name}: {count} records")
         
         print("\n" + "=" * 60)
@@ -297,4 +467,10 @@ else:
         print("   2. Check MySQL is on port 3306")
         print("   3. Verify MySQL password is correct in database.py")
         print("   4. Try opening phpMyAdmin to test MySQL")
-        print("=" * 60)
\ No newline at end of file
+        print("=" * 60)
+    finally:
+        await close_connection_pool()
+
+if __name__ == "__main__":
+    # If run directly, test the database connection
+    asyncio.run(test_connection())
@@ -0,0 +1,36 @@
+"""Export the trained sklearn pipeline to ONNX for ONNX Runtime inference.
+
+Run from the backend directory after retraining:
+    python export_onnx.py
+"""
+import joblib
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType, StringTensorType
+
+from inference import PIPELINE_PATH, META_PATH, ONNX_PATH, PIPELINE_HASH_KEY, file_sha256
+
+pipeline = joblib.load(PIPELINE_PATH)
+meta = joblib.load(META_PATH)
+
+# One [N, 1] input per column, matching inference.onnx_inputs
+initial_types = [(col, FloatTensorType([None, 1])) for col in meta["numeric_cols"]]
+initial_types += [(col, StringTensorType([None, 1])) for col in meta["categorical_cols"]]
+
+# Return probabilities as a plain [N, 2] tensor instead of a list of dicts
+classifier = pipeline.steps[-1][1]
+onnx_model = convert_sklearn(
+    pipeline,
+    initial_types=initial_types,
+    options={id(classifier): {"zipmap": False}},
+    target_opset=17
+)
+
+# Tie the export to this exact pickle so auto backend selection can detect a retrain
+prop = onnx_model.metadata_props.add()
+prop.key = PIPELINE_HASH_KEY
+prop.value = file_sha256(PIPELINE_PATH)
+
+with open(ONNX_PATH, "wb") as f:
+    f.write(onnx_model.SerializeToString())
+
+print(f" Exported pipeline to {ONNX_PATH}")
@@ -0,0 +1,53 @@
+"""Compile the pipeline's tree ensemble to a native library with Treelite,
+and freeze its preprocessing parameters for inference.encode_columns.
+
+The library is platform-specific, so run this on the serving host
+(from the backend directory) after retraining:
+    python export_treelite.py
+"""
+import joblib
+import tl2cgen
+import treelite
+
+from inference import (
+    PIPELINE_PATH, TREELITE_PATH, TREELITE_ENCODING_PATH, PIPELINE_HASH_KEY, file_sha256
+)
+
+pipeline = joblib.load(PIPELINE_PATH)
+
+# Only the classifier is compiled; preprocessing is frozen below
+classifier = pipeline.steps[-1][1]
+model = treelite.sklearn.import_model(classifier)
+
+# quantize stores split thresholds as small integer indices for cache locality
+tl2cgen.export_lib(
+    model,
+    toolchain="gcc",
+    libpath=TREELITE_PATH,
+    params={"parallel_comp": 8, "quantize": 1}
+)
+
+print(f" Compiled classifier to {TREELITE_PATH}")
+
+# StandardScaler parameters and {column: {category: code}} for the OrdinalEncoder
+preprocessor = pipeline.steps[0][1]
+transformers = {name: (transformer, cols) for name, transformer, cols in preprocessor.transformers_}
+scaler, numeric_cols = transformers["num"]
+encoder, categorical_cols = transformers["cat"]
+
+encoding = {
+    "numeric_cols": list(numeric_cols),
+    "categorical_cols": list(categorical_cols),
+    "mean": scaler.mean_,
+    "scale": scaler.scale_,
+    "categories": {
+        col: {category: code for code, category in enumerate(categories)}
+        for col, categories in zip(categorical_cols, encoder.categories_)
+    },
+    "classes": classifier.classes_,
+    # Covers the compiled library too, since both are written by this script
+    PIPELINE_HASH_KEY: file_sha256(PIPELINE_PATH)
+}
+joblib.dump(encoding, TREELITE_ENCODING_PATH)
+
+print(f" Saved preprocessing parameters to {TREELITE_ENCODING_PATH}")
@@ -0,0 +1,19 @@
+"""Gunicorn settings for production serving.
+
+Run from the backend directory:
+    gunicorn -c gunicorn.conf.py app:app
+"""
+import multiprocessing
+import os
+
+bind = "127.0.0.1:8080"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+worker_connections = 1000
+keepalive = 30
+
+# Import the app once in the master. With MODEL_BACKEND=sklearn the pipeline is
+# loaded there and shared copy-on-write by the forked workers; the ONNX and
+# Treelite backends load per worker, so preloading saves nothing for them.
+preload_app = True
+raw_env = ["PRELOAD_MODEL=1"]
@@ -0,0 +1,283 @@
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict
+
+import joblib
+import numpy as np
+import pandas as pd
+
+try:
+    import onnxruntime as ort
+except ImportError:  # serve without ONNX Runtime
+    ort = None
+
+try:
+    import onnx
+except ImportError:  # can't read ONNX metadata, so auto mode won't pick ONNX
+    onnx = None
+
+try:
+    import tl2cgen
+except ImportError:  # serve without the compiled Treelite model
+    tl2cgen = None
+
+try:
+    from numba import njit
+except ImportError:  # encode features with the plain Python loop
+    njit = None
+
+# Model artifacts (paths are relative to the backend directory)
+PIPELINE_PATH = "../best_pipeline.pkl"
+META_PATH = "../pipeline_meta.pkl"
+ONNX_PATH = "../best_pipeline.onnx"  # written by export_onnx.py
+TREELITE_PATH = "../best_classifier.so"  # built on the serving host by export_treelite.py
+TREELITE_ENCODING_PATH = "../best_classifier_encoding.pkl"  # also written by export_treelite.py
+
+# Exported models record the SHA-256 of the pickle they were built from under this key
+PIPELINE_HASH_KEY = "pipeline_sha256"
+
+def file_sha256(path: str) -> str:
+    """Return the hex SHA-256 digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def exported_pipeline_hash(backend: str) -> str:
+    """Return the pipeline hash recorded by the export script for a backend (None if absent)"""
+    if backend == "onnx":
+        # Reads only the protobuf; no ONNX Runtime session (and thread pool) is created
+        model = onnx.load(ONNX_PATH, load_external_data=False)
+        return {prop.key: prop.value for prop in model.metadata_props}.get(PIPELINE_HASH_KEY)
+    return joblib.load(TREELITE_ENCODING_PATH).get(PIPELINE_HASH_KEY)
+
+def select_backend() -> str:
+    """Pick the fastest available backend whose export matches the current pickle"""
+    available = []
+    if tl2cgen is not None and os.path.exists(TREELITE_PATH) and os.path.exists(TREELITE_ENCODING_PATH):
+        available.append("treelite")
+    if ort is not None and onnx is not None and os.path.exists(ONNX_PATH):
+        available.append("onnx")
+    
+    pipeline_hash = file_sha256(PIPELINE_PATH)
+    for backend in available:
+        if exported_pipeline_hash(backend) == pipeline_hash:
+            return backend
+        # Retrained since the export: serving it would silently use the old model
+        print(f"⚠️  {backend} model is out of date with {PIPELINE_PATH}, re-run export_{backend}.py")
+    return "sklearn"
+
+# Inference backend: "treelite", "onnx", "sklearn" or "auto" (first one available and current)
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "auto")
+if MODEL_BACKEND == "auto":
+    MODEL_BACKEND = select_backend()
+
+# Number of distinct feature vectors whose predictions are kept in memory
+PREDICTION_CACHE_SIZE = 4096
+
+# Micro-batching: single predictions arriving within BATCH_WINDOW seconds
+# of each other share one model call of up to MAX_BATCH_SIZE rows
+MAX_BATCH_SIZE = 64
+BATCH_WINDOW = 0.01
+
+# Feature metadata is tiny, so load it eagerly
+meta = joblib.load(META_PATH)
+FEATURE_ORDER = meta["all_feature_columns"]
+NUMERIC_COLS = meta["numeric_cols"]
+CATEGORICAL_COLS = meta["categorical_cols"]
+
+# Loaded lazily in each worker (the sklearn pipeline before fork by warm_up() under gunicorn --preload)
+_pipeline = None
+_onnx_session = None
+_treelite_predictor = None
+_treelite_encoding = None
+
+# Recent single predictions, keyed by feature tuple. The model is loaded once per
+# process and never reloaded, so entries stay valid until a restart.
+_prediction_cache = OrderedDict()
+
+def get_pipeline():
+    """Return the ML pipeline, loading it on first use"""
+    global _pipeline
+    if _pipeline is None:
+        # mmap_mode only maps plain ndarray attributes (e.g. the scaler's mean_/scale_);
+        # sklearn's Tree.__setstate__ copies every tree's node arrays into private
+        # memory, so the ensemble itself is shared only copy-on-write after warm_up()
+        _pipeline = joblib.load(PIPELINE_PATH, mmap_mode="r")
+    return _pipeline
+
+def warm_up():
+    """Load the sklearn pipeline now so forked workers share it copy-on-write"""
+    # Only MODEL_BACKEND=sklearn has model state worth preloading. ONNX Runtime
+    # sessions and Treelite predictors own thread pools, so they must be created
+    # inside each worker, and the Treelite encoding is only a few KB.
+    if MODEL_BACKEND == "sklearn":
+        get_pipeline()
+
+def get_onnx_session():
+    """Return the ONNX Runtime session, creating it on first use"""
+    global _onnx_session
+    if _onnx_session is None:
+        if ort is None:
+            raise RuntimeError("MODEL_BACKEND=onnx requires the onnxruntime package")
+        # Requests are already parallel across workers, so keep each session single-threaded
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = 1
+        options.inter_op_num_threads = 1
+        _onnx_session = ort.InferenceSession(
+            ONNX_PATH, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+    return _onnx_session
+
+def get_treelite_predictor():
+    """Return the compiled Treelite predictor, loading it on first use"""
+    global _treelite_predictor
+    if _treelite_predictor is None:
+        if tl2cgen is None:
+            raise RuntimeError("MODEL_BACKEND=treelite requires the tl2cgen package")
+        _treelite_predictor = tl2cgen.Predictor(TREELITE_PATH, nthread=1)
+    return _treelite_predictor
+
+def get_treelite_encoding():
+    """Return the frozen preprocessing parameters for the Treelite model"""
+    global _treelite_encoding
+    if _treelite_encoding is None:
+        _treelite_encoding = joblib.load(TREELITE_ENCODING_PATH)
+    return _treelite_encoding
+
+def frame_columns(df: pd.DataFrame) -> dict:
+    """Split a DataFrame into float64 numeric and str categorical feature arrays"""
+    columns = {col: df[col].to_numpy(dtype=np.float64) for col in NUMERIC_COLS}
+    columns.update({col: df[col].astype(str).to_numpy(dtype=object) for col in CATEGORICAL_COLS})
+    return columns
+
+def row_columns(rows: list) -> dict:
+    """Transpose validated rows (in FEATURE_ORDER) into feature arrays without pandas"""
+    values = dict(zip(FEATURE_ORDER, zip(*rows)))
+    columns = {col: np.array(values[col], dtype=np.float64) for col in NUMERIC_COLS}
+    columns.update({col: np.array(values[col], dtype=object) for col in CATEGORICAL_COLS})
+    return columns
+
+def onnx_inputs(columns: dict) -> dict:
+    """Build the ONNX feed ([N, 1] array per feature column)"""
+    inputs = {col: columns[col].astype(np.float32).reshape(-1, 1) for col in NUMERIC_COLS}
+    inputs.update({col: columns[col].reshape(-1, 1) for col in CATEGORICAL_COLS})
+    return inputs
+
+def encode_features(numeric, mean, scale, codes, out):
+    """Write standard-scaled numeric columns followed by category codes into out"""
+    n_numeric = numeric.shape[1]
+    for i in range(numeric.shape[0]):
+        for j in range(n_numeric):
+            out[i, j] = (numeric[i, j] - mean[j]) / scale[j]
+        for j in range(codes.shape[1]):
+            out[i, n_numeric + j] = codes[i, j]
+
+if njit is not None:
+    encode_features = njit(cache=True)(encode_features)
+
+def encode_columns(columns: dict) -> np.ndarray:
+    """Apply the pipeline's StandardScaler + OrdinalEncoder without sklearn"""
+    encoding = get_treelite_encoding()
+    numeric = np.column_stack([columns[col] for col in encoding["numeric_cols"]])
+    
+    # Unknown categories map to -1, like the encoder's unknown_value
+    codes = np.empty((len(numeric), len(encoding["categorical_cols"])), dtype=np.float64)
+    for j, col in enumerate(encoding["categorical_cols"]):
+        mapping = encoding["categories"][col]
+        codes[:, j] = [mapping.get(value, -1) for value in columns[col]]
+    
+    # float32 like sklearn's own trees
+    out = np.empty((len(numeric), numeric.shape[1] + codes.shape[1]), dtype=np.float32)
+    encode_features(numeric, encoding["mean"], encoding["scale"], codes, out)
+    return out
+
+def predict_columns(columns: dict) -> tuple:
+    """Predict labels and positive-class probabilities from feature arrays"""
+    if MODEL_BACKEND == "onnx":
+        labels, probs = get_onnx_session().run(None, onnx_inputs(columns))
+        return labels, probs[:, 1]
+    
+    if MODEL_BACKEND == "treelite":
+        output = get_treelite_predictor().predict(tl2cgen.DMatrix(encode_columns(columns)))
+        probs = output.reshape(len(output), -1)[:, -1]
+        labels = get_treelite_encoding()["classes"][(probs > 0.5).astype(int)]
+        return labels, probs
+    
+    # The sklearn ColumnTransformer selects features by name, so it needs a DataFrame
+    pipeline = get_pipeline()
+    probs = pipeline.predict_proba(pd.DataFrame(columns, columns=FEATURE_ORDER))
+    labels = pipeline.classes_[probs.argmax(axis=1)]
+    return labels, probs[:, 1]
+
+def predict_rows(rows: list) -> list:
+    """Predict (label, probability) for rows given in FEATURE_ORDER"""
+    labels, probs = predict_columns(row_columns(rows))
+    return list(zip(labels.tolist(), probs.tolist()))
+
+class PredictionBatcher:
+    """Coalesces concurrent single-row predictions into batched model calls"""
+    
+    def __init__(self, max_batch_size: int = MAX_BATCH_SIZE, window: float = BATCH_WINDOW):
+        self.max_batch_size = max_batch_size
+        self.window = window
+        self.queue = None
+        self.task = None
+    
+    def start(self):
+        """Start the background batching task on the running event loop"""
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self.run())
+    
+    async def stop(self):
+        """Stop the background batching task"""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+    
+    async def predict(self, features: tuple) -> tuple:
+        """Queue one feature tuple and wait for its (label, probability)"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((features, future))
+        return await future
+    
+    async def run(self):
+        while True:
+            # Wait for a first request, then give others a moment to join it
+            items = [await self.queue.get()]
+            await asyncio.sleep(self.window)
+            while len(items) < self.max_batch_size and not self.queue.empty():
+                items.append(self.queue.get_nowait())
+            
+            try:
+                results = await asyncio.to_thread(predict_rows, [features for features, _ in items])
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            for (_, future), result in zip(items, results):
+                if not future.done():
+                    future.set_result(result)
+
+batcher = PredictionBatcher()
+
+async def predict(features: tuple) -> tuple:
+    """Predict (label, probability) for one row, using the cache and the batcher"""
+    if features in _prediction_cache:
+        _prediction_cache.move_to_end(features)
+        return _prediction_cache[features]
+    
+    result = await batcher.predict(features)
+    
+    _prediction_cache[features] = result
+    if len(_prediction_cache) > PREDICTION_CACHE_SIZE:
+        _prediction_cache.popitem(last=False)
+    return result